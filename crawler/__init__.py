@@ -26,3 +26,6 @@ class Crawler(object):
     def join(self):
         for worker in self.workers:
             worker.join()
+        sync_meta = getattr(self.frontier, "sync_meta", None)
+        if sync_meta:
+            sync_meta()
@@ -1,15 +1,17 @@
 import os
 import shelve
+import shutil
 import dbm.dumb
 
-from urllib.parse import urlparse
 from threading import Thread, RLock
-from queue import Queue, Empty
+from queue import Empty
 from collections import defaultdict
+from functools import partial
 import time
 
-from utils import get_logger, get_urlhash, normalize
+from utils import get_logger, get_urlhash, get_domain, normalize
 from scraper import is_valid
+from utils.spill_queue import SpillQueue
 
 class Frontier(object):
     def __init__(self, config, restart):
@@ -17,7 +19,11 @@ class Frontier(object):
         self.config = config
         
         # Multithreading
-        self.subdomain_queues = defaultdict(Queue)
+        # Pending urls are rebuilt from the save file on start, so any
+        # segments spilled by a previous run are stale.
+        shutil.rmtree(self.config.spill_dir, ignore_errors=True)
+        self.subdomain_queues = defaultdict(partial(
+            SpillQueue, self.config.spill_dir, self.config.queue_memory))
         self.in_progress_domains = set()
         self.domainLastAccessed = {}
 
@@ -36,17 +42,21 @@ class Frontier(object):
             for ext in ['.bak', '.dat', '.dir']:
                 if os.path.exists(self.config.save_file + ext):
                     os.remove(self.config.save_file + ext)
+                if os.path.exists(self.config.save_file + ".meta" + ext):
+                    os.remove(self.config.save_file + ".meta" + ext)
         # Load existing save file, or create one if it does not exist.
         self.save = shelve.Shelf(dbm.dumb.open(self.config.save_file, 'c'))
+        # Per-url fetch metadata used by incremental recrawls.
+        self.meta = shelve.Shelf(
+            dbm.dumb.open(self.config.save_file + ".meta", 'c'))
+        self.unsynced_meta = 0
         if restart:
-            for url in self.config.seed_urls:
-                self.add_url(url)
+            self.add_urls(self.config.seed_urls)
         else:
             # Set the frontier state with contents of save file.
             self._parse_save_file()
             if not self.save:
-                for url in self.config.seed_urls:
-                    self.add_url(url)
+                self.add_urls(self.config.seed_urls)
 
     
     def _parse_save_file(self):
@@ -54,15 +64,27 @@ class Frontier(object):
         with self.lock:
             total_count = len(self.save)
             tbd_count = 0
-            for url, completed in self.save.values():
-                if not completed and is_valid(url):
-                    # Organize by the domain
-                    domain = ".".join(urlparse(url).netloc.split(".")[-3:])
-                    self.subdomain_queues[domain].put(url)
-                    tbd_count += 1
+            revisit_count = 0
+            now = time.time()
+            for urlhash, (url, completed) in self.save.items():
+                if not is_valid(url):
+                    continue
+                if completed:
+                    # Completed pages only come back when recrawling, once
+                    # their revisit interval has passed.
+                    if not self.config.recrawl:
+                        continue
+                    meta = self.meta.get(urlhash)
+                    if meta and meta["next_visit"] > now:
+                        continue
+                    revisit_count += 1
+                # Organize by the domain
+                domain = get_domain(url)
+                self.subdomain_queues[domain].put(url)
+                tbd_count += 1
             self.logger.info(
                 f"Found {tbd_count} urls to be downloaded from {total_count} "
-                f"total urls discovered.")
+                f"total urls discovered ({revisit_count} due for a revisit).")
         
 
     def get_tbd_url(self):
@@ -88,7 +110,7 @@ class Frontier(object):
                     break
                 
             for empty_queue in empty_queues:
-                del self.subdomain_queues[empty_queue]
+                self.subdomain_queues.pop(empty_queue).close()
 
             if not domain_to_add:
                 return None
@@ -105,21 +127,42 @@ class Frontier(object):
         
 
     def add_url(self, url):
-        url = normalize(url)
-        urlhash = get_urlhash(url)
-        domain = ".".join(urlparse(url).netloc.split(".")[-3:])
+        self.add_urls([url])
 
-        with self.lock:
-            if urlhash not in self.save:
-                self.save[urlhash] = (url, False)
-                self.save.sync()
 
+    def add_urls(self, urls):
+        # Normalize, hash and dedupe the batch before touching the lock.
+        batch = {}
+        for url in urls:
+            if not url:
+                continue
+            url = normalize(url)
+            urlhash = get_urlhash(url)
+            if urlhash not in batch:
+                batch[urlhash] = url
+
+        if not batch:
+            return
+
+        with self.lock:
+            new_entries = {
+                urlhash: (url, False) for urlhash, url in batch.items()
+                if urlhash not in self.save}
+            if not new_entries:
+                return
+
+            # One write and one sync for the whole batch.
+            self.save.update(new_entries)
+            self.save.sync()
+
+            for url, _ in new_entries.values():
+                domain = get_domain(url)
                 self.subdomain_queues[domain].put(url)
     
 
     def mark_url_complete(self, url):
         urlhash = get_urlhash(url)
-        domain = ".".join(urlparse(url).netloc.split(".")[-3:])
+        domain = get_domain(url)
 
         with self.lock:
             if urlhash not in self.save:
@@ -138,6 +181,49 @@ class Frontier(object):
             # if domain in self.in_progress_domains:
             #     self.in_progress_domains.remove(domain)
 
+    def get_page_meta(self, url):
+        with self.lock:
+            return self.meta.get(get_urlhash(url))
+
+    def record_fetch(self, url, content_hash, fingerprint, outlinks, validators):
+        ''' Store what a fetch of url saw and schedule its next revisit.
+
+        The revisit interval doubles while the content hash stays the same
+        and halves when it changes, within the configured bounds. The meta
+        store is only synced every METASYNCEVERY records; losing the
+        latest ones just means those pages get parsed again on a recrawl.
+        '''
+        urlhash = get_urlhash(url)
+        now = time.time()
+
+        with self.lock:
+            old = self.meta.get(urlhash)
+            if old is None:
+                interval = self.config.min_revisit
+            elif old["content_hash"] == content_hash:
+                interval = min(old["interval"] * 2, self.config.max_revisit)
+            else:
+                interval = max(old["interval"] / 2, self.config.min_revisit)
+
+            self.meta[urlhash] = {
+                "url": url,
+                "last_fetch": now,
+                "content_hash": content_hash,
+                "fingerprint": fingerprint,
+                "outlinks": list(outlinks),
+                "validators": validators,
+                "interval": interval,
+                "next_visit": now + interval,
+            }
+            self.unsynced_meta += 1
+            if self.unsynced_meta >= self.config.meta_sync_every:
+                self.sync_meta()
+
+    def sync_meta(self):
+        with self.lock:
+            self.meta.sync()
+            self.unsynced_meta = 0
+
     def has_pending_urls(self):
         #check if there are any pending URLs in any queue
 
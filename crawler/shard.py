@@ -0,0 +1,352 @@
+import json
+import socket
+import struct
+import time
+
+from collections import defaultdict
+from hashlib import sha256
+from threading import Thread, Lock, Condition
+
+from utils import get_logger, get_domain
+from crawler.frontier import Frontier
+
+# Messages are length prefixed JSON objects:
+#   hello   shard -> coordinator  {"shard": id}
+#   welcome coordinator -> shard  {"cache_server": [host, port]}
+#   links   both ways             {"shard": destination, "urls": [...]}
+#   status  shard -> coordinator  {"idle": bool, "received": batches applied}
+#   stop    coordinator -> shard  {}
+#   stats   shard -> coordinator  {"stats": scraper.get_statistics()}
+_HEADER = struct.Struct(">I")
+
+
+def send_message(sock, msg_type, **fields):
+    fields["type"] = msg_type
+    data = json.dumps(fields).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock):
+    ''' Returns the next message, or None once the peer has closed. '''
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exactly(sock, _HEADER.unpack(header)[0])
+    if data is None:
+        return None
+    return json.loads(data.decode("utf-8"))
+
+
+def _recv_exactly(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def shard_for_url(url, shard_count):
+    ''' Shard owning url, by hash range of the frontier's domain key.
+
+    Every url of a domain lands on the same shard, so that shard alone
+    enforces politeness for it.
+    '''
+    key = int.from_bytes(sha256(get_domain(url).encode("utf-8")).digest()[:8], "big")
+    return (key * shard_count) >> 64
+
+
+class ShardLink(object):
+    ''' A shard's connection to the coordinator. '''
+    def __init__(self, shard_id, shard_count, coordinator, batch_size=500, flush_interval=1.0):
+        self.logger = get_logger(f"SHARD-{shard_id}")
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.outgoing = defaultdict(list)
+        self.last_flush = time.time()
+        self.received = 0
+        self.last_status = None
+        self.stopped = False
+        self.on_links = None
+
+        self.send_lock = Lock()
+        self.buffer_lock = Lock()
+        self.status_lock = Lock()
+        self.sock = socket.create_connection(parse_address(coordinator))
+        send_message(self.sock, "hello", shard=shard_id)
+        welcome = recv_message(self.sock)
+        if welcome is None or welcome["type"] != "welcome":
+            raise RuntimeError(f"Coordinator {coordinator} refused shard {shard_id}.")
+        self.cache_server = tuple(welcome["cache_server"])
+
+    def start(self, on_links):
+        ''' Start handing batches routed to this shard to on_links. '''
+        self.on_links = on_links
+        Thread(target=self._read_loop, daemon=True).start()
+        Thread(target=self._flush_loop, daemon=True).start()
+
+    def route(self, shard, urls):
+        with self.buffer_lock:
+            self.outgoing[shard].extend(urls)
+            due = (
+                len(self.outgoing[shard]) >= self.batch_size
+                or time.time() - self.last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.buffer_lock:
+            batches = self.outgoing
+            self.outgoing = defaultdict(list)
+            self.last_flush = time.time()
+        for shard, urls in batches.items():
+            self._send("links", shard=shard, urls=urls)
+
+    def report(self, idle, received):
+        ''' Tell the coordinator whether this shard has run out of work.
+
+        received must be read before checking for pending work, so a batch
+        applied in between is never reported as handled by an idle shard.
+        '''
+        if idle:
+            # Everything we discovered has to be with the coordinator before
+            # it can decide the crawl is over.
+            self.flush()
+        with self.status_lock:
+            status = (idle, received)
+            if status != self.last_status:
+                self.last_status = status
+                self._send("status", idle=idle, received=received)
+
+    def send_stats(self, stats):
+        self._send("stats", stats=stats)
+
+    def close(self):
+        self.sock.close()
+
+    def _send(self, msg_type, **fields):
+        with self.send_lock:
+            send_message(self.sock, msg_type, **fields)
+
+    def _flush_loop(self):
+        # Send buffered batches on time even while this shard stays busy on
+        # its own domains and route() isn't called for other shards.
+        while not self.stopped:
+            time.sleep(self.flush_interval)
+            if time.time() - self.last_flush >= self.flush_interval:
+                try:
+                    self.flush()
+                except OSError as e:
+                    self.logger.error(f"Failed to send link batches: {e!r}")
+
+    def _read_loop(self):
+        try:
+            while True:
+                msg = recv_message(self.sock)
+                if msg is None:
+                    self.logger.error("Lost connection to coordinator, stopping.")
+                    break
+                if msg["type"] == "links":
+                    self.on_links(msg["urls"])
+                    self.received += 1
+                elif msg["type"] == "stop":
+                    break
+        except Exception as e:
+            # Without this the thread would die with stopped still False and
+            # the workers would wait on has_pending_urls forever.
+            self.logger.error(f"Failed handling coordinator message, stopping: {e!r}")
+        self.stopped = True
+
+
+class ShardedFrontier(Frontier):
+    ''' Frontier that only keeps urls of domains owned by this shard.
+
+    Links for other shards are batched to the coordinator, and the frontier
+    only runs dry once the coordinator says every shard is done.
+    '''
+    def __init__(self, config, restart, link):
+        self.link = link
+        super().__init__(config, restart)
+        link.start(self._receive_links)
+
+    def add_urls(self, urls):
+        local = []
+        remote = defaultdict(list)
+        for url in urls:
+            if not url:
+                continue
+            shard = shard_for_url(url, self.link.shard_count)
+            if shard == self.link.shard_id:
+                local.append(url)
+            else:
+                remote[shard].append(url)
+        super().add_urls(local)
+        for shard, shard_urls in remote.items():
+            self.link.route(shard, shard_urls)
+
+    def _receive_links(self, urls):
+        super().add_urls(urls)
+
+    def has_pending_urls(self):
+        received = self.link.received
+        if super().has_pending_urls():
+            self.link.report(False, received)
+            return True
+        self.link.report(True, received)
+        return not self.link.stopped
+
+
+class Coordinator(object):
+    ''' Routes link batches between shards and decides when the crawl ends.
+
+    The crawl is over once every shard reports idle and has applied every
+    batch the coordinator forwarded to it; at that point no links can be in
+    flight anywhere.
+    '''
+    def __init__(self, shard_count, cache_server, address):
+        self.logger = get_logger("COORDINATOR")
+        self.shard_count = shard_count
+        self.cache_server = cache_server
+
+        self.server = socket.create_server(parse_address(address))
+        self.address = self.server.getsockname()[:2]
+
+        self.condition = Condition()
+        self.conns = {}
+        self.send_locks = {}
+        self.forwarded = defaultdict(int)
+        self.status = {}
+        self.stats = {}
+        self.finished = False
+
+    def accept_shards(self, processes=(), handshake_timeout=10.0):
+        ''' Wait until every shard has said hello.
+
+        processes are the local shard processes, if any. Raises RuntimeError
+        if one of them exits before every shard has connected, since the
+        crawl could never start.
+        '''
+        self.server.settimeout(1.0)
+        while len(self.conns) < self.shard_count:
+            for process in processes:
+                if process.poll() is not None:
+                    self.close()
+                    raise RuntimeError(
+                        f"Shard process {process.pid} exited with code "
+                        f"{process.returncode} before every shard connected.")
+            try:
+                conn, addr = self.server.accept()
+            except socket.timeout:
+                continue
+            shard_id = self._read_hello(conn, handshake_timeout)
+            if shard_id is None or shard_id in self.conns:
+                self.logger.error(f"Rejecting shard {shard_id} from {addr}.")
+                conn.close()
+                continue
+            self.logger.info(f"Shard {shard_id} connected from {addr}.")
+            self.conns[shard_id] = conn
+            self.send_locks[shard_id] = Lock()
+        self.server.close()
+
+        # Only start crawling once every shard can receive links.
+        for shard_id, conn in self.conns.items():
+            self._send(shard_id, "welcome", cache_server=list(self.cache_server))
+            Thread(target=self._read_loop, args=(shard_id, conn), daemon=True).start()
+
+    def close(self):
+        self.server.close()
+        for conn in self.conns.values():
+            conn.close()
+
+    def _read_hello(self, conn, timeout):
+        ''' Returns the shard id from a hello, or None if the handshake is bad. '''
+        conn.settimeout(timeout)
+        try:
+            hello = recv_message(conn)
+        except (OSError, ValueError):
+            return None
+        conn.settimeout(None)
+        if not isinstance(hello, dict) or hello.get("type") != "hello":
+            return None
+        shard_id = hello.get("shard")
+        if type(shard_id) is not int or shard_id not in range(self.shard_count):
+            return None
+        return shard_id
+
+    def run(self):
+        ''' Wait for the crawl to finish and return each shard's statistics. '''
+        with self.condition:
+            self.condition.wait_for(self._crawl_done)
+            self.finished = True
+        self.logger.info("All shards are idle, stopping them.")
+        for shard_id in self.conns:
+            self._send(shard_id, "stop")
+        with self.condition:
+            self.condition.wait_for(
+                lambda: len(self.stats) + self._lost_count() >= self.shard_count)
+        for conn in self.conns.values():
+            conn.close()
+        return list(self.stats.values())
+
+    def _crawl_done(self):
+        if self._lost_count():
+            return True
+        return len(self.status) == self.shard_count and all(
+            idle and received == self.forwarded[shard_id]
+            for shard_id, (idle, received) in self.status.items())
+
+    def _lost_count(self):
+        return sum(1 for status in self.status.values() if status is None)
+
+    def _send(self, shard_id, msg_type, **fields):
+        try:
+            with self.send_locks[shard_id]:
+                send_message(self.conns[shard_id], msg_type, **fields)
+        except OSError as e:
+            self.logger.error(f"Could not send {msg_type} to shard {shard_id}: {e}")
+
+    def _read_loop(self, shard_id, conn):
+        while True:
+            try:
+                msg = recv_message(conn)
+                if msg is None:
+                    break
+                self._handle(shard_id, msg)
+            except Exception as e:
+                # A reset connection or a garbled message loses the shard
+                # just like a clean disconnect, instead of killing this thread.
+                self.logger.error(f"Dropping shard {shard_id} after a bad read: {e!r}")
+                conn.close()
+                break
+        with self.condition:
+            if shard_id not in self.stats:
+                if not self.finished:
+                    self.logger.error(
+                        f"Shard {shard_id} disconnected, stopping the crawl.")
+                self.status[shard_id] = None
+            self.condition.notify_all()
+
+    def _handle(self, shard_id, msg):
+        if msg["type"] == "links":
+            # Count before forwarding so a status from the destination
+            # can never look up to date while this batch is in flight.
+            with self.condition:
+                self.forwarded[msg["shard"]] += 1
+            self._send(msg["shard"], "links", shard=msg["shard"], urls=msg["urls"])
+        elif msg["type"] == "status":
+            with self.condition:
+                self.status[shard_id] = (msg["idle"], msg["received"])
+                self.condition.notify_all()
+        elif msg["type"] == "stats":
+            with self.condition:
+                self.stats[shard_id] = msg["stats"]
+                self.condition.notify_all()
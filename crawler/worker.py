@@ -1,6 +1,7 @@
 from threading import Thread
 
 from inspect import getsource
+from hashlib import sha256
 from utils.download import download
 from utils import get_logger
 import scraper
@@ -15,6 +16,7 @@ class Worker(Thread):
         # basic check for requests in scraper
         assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
         assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
+        self.download_count = 0
         super().__init__(daemon=True)
         
     def run(self):
@@ -29,13 +31,41 @@ class Worker(Thread):
                     continue
             try:
                 resp = download(tbd_url, self.config, self.logger)
-                self.logger.info(
-                    f"Downloaded {tbd_url}, status <{resp.status}>, "
-                    f"using cache {self.config.cache_server}.")
-                scraped_urls = scraper.scraper(tbd_url, resp)
-                for scraped_url in scraped_urls:
-                    self.frontier.add_url(scraped_url)
+                self.download_count += 1
+                if self.download_count % self.config.download_log_every == 0:
+                    self.logger.info(
+                        f"Downloaded {tbd_url}, status <{resp.status}>, "
+                        f"using cache {self.config.cache_server}.")
+                content_hash = self.get_content_hash(resp)
+                meta = self.frontier.get_page_meta(tbd_url)
+                if content_hash and meta and meta["content_hash"] == content_hash:
+                    # Unchanged since the last visit, reuse what we found then.
+                    scraped_urls = meta["outlinks"]
+                    fingerprint = meta["fingerprint"]
+                else:
+                    scraped_urls, fingerprint = scraper.scrape_page(tbd_url, resp)
+                self.frontier.record_fetch(
+                    tbd_url, content_hash, fingerprint, scraped_urls,
+                    self.get_validators(resp))
+                self.frontier.add_urls(scraped_urls)
             except Exception as e:
                 self.logger.error(f"Error processing {tbd_url}: {e}")
             finally:
                 self.frontier.mark_url_complete(tbd_url)
+
+    @staticmethod
+    def get_content_hash(resp):
+        if resp.status != 200 or not resp.raw_response or not resp.raw_response.content:
+            return None
+        return sha256(resp.raw_response.content).hexdigest()
+
+    @staticmethod
+    def get_validators(resp):
+        # The cache server can't forward conditional headers, but keep the
+        # validators so a direct fetch could send If-None-Match later.
+        if resp.status != 200 or not resp.raw_response:
+            return {}
+        headers = getattr(resp.raw_response, "headers", None) or {}
+        return {
+            name: headers[name] for name in ("ETag", "Last-Modified")
+            if name in headers}
@@ -1,23 +1,114 @@
+import os
+import sys
+import subprocess
 from configparser import ConfigParser
 from argparse import ArgumentParser
+from functools import partial
 
 from utils.server_registration import get_cache_server
 from utils.config import Config
 from crawler import Crawler
+from crawler.shard import Coordinator, ShardLink, ShardedFrontier, parse_address
+from scraper import final_report, get_statistics, load_statistics, merge_statistics
 
 
-def main(config_file, restart):
+def load_config(config_file, recrawl):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
-    config.cache_server = get_cache_server(config, restart)
+    config.recrawl = recrawl
+    return config
+
+
+def main(config_file, restart, recrawl, cache_server=None):
+    config = load_config(config_file, recrawl)
+    config.cache_server = (
+        parse_address(cache_server) if cache_server
+        else get_cache_server(config, restart))
     crawler = Crawler(config, restart)
     crawler.start()
 
 
+def run_coordinator(config_file, restart, recrawl, shards, address, spawn_shards, cache_server=None):
+    config = load_config(config_file, recrawl)
+    config.cache_server = (
+        parse_address(cache_server) if cache_server
+        else get_cache_server(config, restart))
+    coordinator = Coordinator(shards, config.cache_server, address)
+    host, port = coordinator.address
+    coordinator.logger.info(f"Coordinator listening on {host}:{port} for {shards} shards.")
+
+    processes = []
+    if spawn_shards:
+        for shard_id in range(shards):
+            args = [
+                sys.executable, os.path.abspath(__file__),
+                "--config_file", os.path.abspath(config_file),
+                "--shards", str(shards), "--shard_id", str(shard_id),
+                "--coordinator", f"{host}:{port}"]
+            if restart:
+                args.append("--restart")
+            if recrawl:
+                args.append("--recrawl")
+            processes.append(subprocess.Popen(args))
+
+    try:
+        coordinator.accept_shards(processes)
+    except RuntimeError as e:
+        coordinator.logger.error(f"{e} Stopping the sharded crawl.")
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        sys.exit(1)
+    merge_statistics(coordinator.run())
+    for process in processes:
+        process.wait()
+    final_report()
+
+
+def run_shard(config_file, restart, recrawl, shards, shard_id, coordinator):
+    # Each shard keeps its save file, logs and stats in its own directory,
+    # so several shards can run from one checkout.
+    config_file = os.path.abspath(config_file)
+    shard_dir = os.path.join("shards", f"shard-{shard_id}")
+    os.makedirs(shard_dir, exist_ok=True)
+    os.chdir(shard_dir)
+    load_statistics()
+
+    config = load_config(config_file, recrawl)
+    link = ShardLink(shard_id, shards, coordinator)
+    config.cache_server = link.cache_server
+    crawler = Crawler(
+        config, restart, frontier_factory=partial(ShardedFrontier, link=link))
+    crawler.start_async()
+    crawler.join()
+    link.send_stats(get_statistics())
+    link.close()
+
+
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
+    parser.add_argument("--recrawl", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--cache_server", type=str, default=None,
+                        help="host:port of a cache server to use instead of registering")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="split the crawl across this many shards by domain")
+    parser.add_argument("--shard_id", type=int, default=None,
+                        help="run as this shard of a sharded crawl")
+    parser.add_argument("--coordinator", type=str, default="127.0.0.1:0",
+                        help="host:port the coordinator listens on, or shards connect to")
+    parser.add_argument("--remote_shards", action="store_true", default=False,
+                        help="coordinator waits for shards started on other hosts")
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    if args.shard_id is not None:
+        if args.shard_id not in range(args.shards):
+            parser.error("--shard_id needs --shards greater than it")
+        run_shard(args.config_file, args.restart, args.recrawl,
+                  args.shards, args.shard_id, args.coordinator)
+    elif args.shards:
+        run_coordinator(args.config_file, args.restart, args.recrawl, args.shards,
+                        args.coordinator, not args.remote_shards, args.cache_server)
+    else:
+        main(args.config_file, args.restart, args.recrawl, args.cache_server)
\ No newline at end of file
@@ -13,8 +13,19 @@ website_fps = []
 website_fps_wordcount = []  #track word count for each fingerprint
 
 def scraper(url, resp):
-    links = extract_next_links(url, resp)
-    return [link for link in links if is_valid(link)]
+    return scrape_page(url, resp)[0]
+
+
+def scrape_page(url, resp):
+    """
+    Scrapes the page for links worth crawling
+
+    :return: The valid links, and the page's simhash fingerprint (None if the page was not fingerprinted)
+    """
+    links, fingerprint = extract_links_and_fingerprint(url, resp)
+    # Pages repeat nav links a lot, so only validate each link once.
+    # dict.fromkeys keeps the order links appeared on the page.
+    return [link for link in dict.fromkeys(links) if link and is_valid(link)], fingerprint
 
 
 def get_simhash_fingerprint(words: list) -> int:
@@ -48,7 +59,7 @@ def get_simhash_fingerprint(words: list) -> int:
     return fingerprint
 
 
-def is_near_dup(page_words: list) -> bool:
+def is_near_dup(page_words: list, curr_fingerprint: int) -> bool:
     word_count = len(page_words)
     
     #only compare against pages with similar word count
@@ -57,10 +68,8 @@ def is_near_dup(page_words: list) -> bool:
         if abs(word_count - stored_count) / max(word_count, stored_count, 1) <= 0.2:
             candidates.append(idx)
     
-    #if many candidates, compute fingerprint and compare
+    #if many candidates, compare fingerprints
     if candidates:
-        curr_fingerprint = get_simhash_fingerprint(page_words)
-        
         for idx in candidates:
             difference_distance = (curr_fingerprint ^ website_fps[idx]).bit_count()
             similarity = (64 - difference_distance) / 64
@@ -69,13 +78,17 @@ def is_near_dup(page_words: list) -> bool:
                 return True
     
     #store for future comparisons
-    website_fps.append(get_simhash_fingerprint(page_words) if not candidates else curr_fingerprint)
+    website_fps.append(curr_fingerprint)
     website_fps_wordcount.append(word_count)
     
     return False
 
 
 def extract_next_links(url: str, resp):
+    return extract_links_and_fingerprint(url, resp)[0]
+
+
+def extract_links_and_fingerprint(url: str, resp):
     # Implementation required.
     # url: the URL that was used to get the page
     # resp.url: the actual url of the page
@@ -85,10 +98,11 @@ def extract_next_links(url: str, resp):
     #         resp.raw_response.url: the url, again
     #         resp.raw_response.content: the content of the page!
     # Return a list with the hyperlinks (as strings) scrapped from resp.raw_response.content
+    # Also returns the page's simhash fingerprint, or None if the page was not fingerprinted
     
     # If the webpage fetch fails or is empty, then just return, no links to extract.
     if (resp.status != 200 or not resp.raw_response or not resp.raw_response.content):
-        return []
+        return [], None
     
     # Setting up BS Object for page parsing
     bs_web = BeautifulSoup(resp.raw_response.content, "html.parser")
@@ -100,10 +114,11 @@ def extract_next_links(url: str, resp):
         seen_urls.add(resp.url)
     
     if len(page_words) < 50:
-        return []  # Don't crawl links from low content pages
+        return [], None  # Don't crawl links from low content pages
     
-    if is_near_dup(page_words):
-        return []  # Don't crawl links from duplicate pages
+    fingerprint = get_simhash_fingerprint(page_words)
+    if is_near_dup(page_words, fingerprint):
+        return [], fingerprint  # Don't crawl links from duplicate pages
 
     anchor_tags = bs_web.find_all('a', href=True)
     
@@ -117,7 +132,7 @@ def extract_next_links(url: str, resp):
         except Exception:
             continue
     
-    return extract_links
+    return extract_links, fingerprint
 
 def is_valid(url):
     # Decide whether to crawl this url or not. 
@@ -288,6 +303,8 @@ def load_statistics():
                 most_common_words = Counter(data.get('most_common_words', {}))
                 # Convert list of URLs back to sets for each subdomain
                 sub_domain_pages = {k: set(v) for k, v in data.get('sub_domain_pages', {}).items()}
+                # Pages already counted, so revisits don't count them again
+                seen_urls = set().union(*sub_domain_pages.values())
             print(f"Resuming from previous run: {unique_page_count} pages, {len(sub_domain_pages)} subdomains")
         except Exception as e:
             print(f"Warning: Failed to load stats: {e}, starting from scratch")
@@ -310,10 +327,40 @@ def save_statistics():
         print(f"Failed to save stats: {e}")
 
 #load existing stats when module is imported
-try:
-    load_statistics()
-except Exception as e:
-    print(f"Error during stats loading: {e}, continuing anyway")
+#shards load theirs once they have moved into their own directory (launch.run_shard)
+if '--shard_id' not in sys.argv:
+    try:
+        load_statistics()
+    except Exception as e:
+        print(f"Error during stats loading: {e}, continuing anyway")
+
+def get_statistics():
+    """statistics of this process, in a JSON friendly form for merging"""
+    return {
+        'unique_page_count': unique_page_count,
+        'longest_page_length': longest_page_length,
+        'longest_page_link': longest_page_link,
+        'most_common_words': dict(most_common_words),
+        'sub_domain_pages': {k: list(v) for k, v in sub_domain_pages.items()},
+    }
+
+def merge_statistics(shard_stats: list) -> None:
+    """replace this process's statistics with the combined stats of all shards"""
+    global unique_page_count, longest_page_length, longest_page_link, most_common_words, sub_domain_pages
+    unique_page_count = 0
+    longest_page_length = -1
+    longest_page_link = ""
+    most_common_words = Counter()
+    sub_domain_pages = {}
+
+    for stats in shard_stats:
+        unique_page_count += stats['unique_page_count']
+        if stats['longest_page_length'] > longest_page_length:
+            longest_page_length = stats['longest_page_length']
+            longest_page_link = stats['longest_page_link']
+        most_common_words.update(stats['most_common_words'])
+        for hostname, urls in stats['sub_domain_pages'].items():
+            sub_domain_pages.setdefault(hostname, set()).update(urls)
 
 def update_statistics(url: str, tokens: list) -> None:
     global unique_page_count, longest_page_length, longest_page_link, most_common_words, sub_domain_pages
@@ -0,0 +1,12 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(autouse=True, scope="session")
+def run_in_tmp_dir(tmp_path_factory):
+    ''' The crawler writes Logs/, save files and stats to the working directory. '''
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("run"))
+    yield
+    os.chdir(cwd)
@@ -0,0 +1,169 @@
+import atexit
+import random
+import time
+from collections import Counter
+from threading import Thread
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("cbor")
+pytest.importorskip("requests")
+
+import scraper
+from crawler.shard import Coordinator, ShardLink, ShardedFrontier, shard_for_url
+from utils import get_domain
+
+# Importing scraper registers hooks that write stats files on exit.
+atexit.unregister(scraper.save_statistics)
+atexit.unregister(scraper.final_report)
+
+DOMAINS = [f"www.dept{i}.uci.edu" for i in range(8)]
+PAGES_PER_DOMAIN = 60
+
+
+class FakeConfig(object):
+    def __init__(self, save_file):
+        self.save_file = save_file
+        self.spill_dir = f"{save_file}.spill"
+        self.queue_memory = 50
+        self.seed_urls = [f"https://{DOMAINS[0]}/p0", f"https://{DOMAINS[5]}/p0"]
+        self.time_delay = 0
+        self.recrawl = False
+        self.min_revisit = 3600
+        self.max_revisit = 3600
+
+
+def links_of(url):
+    rnd = random.Random(url)
+    return [
+        f"https://{rnd.choice(DOMAINS)}/p{rnd.randrange(PAGES_PER_DOMAIN)}"
+        for _ in range(4)]
+
+
+def reachable(seeds):
+    seen = set(seeds)
+    todo = list(seeds)
+    while todo:
+        for link in links_of(todo.pop()):
+            if link not in seen:
+                seen.add(link)
+                todo.append(link)
+    return seen
+
+
+def start_coordinator(shard_count):
+    coordinator = Coordinator(shard_count, ("localhost", 0), "127.0.0.1:0")
+    address = "%s:%d" % coordinator.address
+    accept = Thread(target=coordinator.accept_shards)
+    accept.start()
+
+    links = {}
+    def connect(shard_id):
+        links[shard_id] = ShardLink(shard_id, shard_count, address, flush_interval=0.1)
+    connecting = [Thread(target=connect, args=(i,)) for i in range(shard_count)]
+    for thread in connecting:
+        thread.start()
+    for thread in connecting:
+        thread.join()
+    accept.join()
+    return coordinator, links
+
+
+def crawl_shard(frontier, link, crawled):
+    ''' A single worker, minus the downloading. '''
+    while True:
+        url = frontier.get_tbd_url()
+        if not url:
+            if not frontier.has_pending_urls():
+                break
+            time.sleep(0.01)
+            continue
+        crawled.append(url)
+        frontier.add_urls(links_of(url))
+        frontier.mark_url_complete(url)
+    link.send_stats({"crawled": crawled})
+    link.close()
+
+
+def run_in_thread(target):
+    result = []
+    thread = Thread(target=lambda: result.append(target()), daemon=True)
+    thread.start()
+    return thread, result
+
+
+def test_shard_for_url_keeps_domains_together():
+    for shard_count in (1, 3, 7):
+        shards = {shard_for_url(f"https://www.dept{i}.uci.edu", shard_count) for i in range(200)}
+        assert shards == set(range(shard_count))
+
+    # Same domain key, same shard, whatever the subdomain or path.
+    assert get_domain("https://vision.ics.uci.edu/a") == get_domain("https://www.ics.uci.edu")
+    assert shard_for_url("https://vision.ics.uci.edu/a", 5) == shard_for_url("https://www.ics.uci.edu", 5)
+
+
+def test_sharded_crawl_visits_every_url_once(tmp_path):
+    shard_count = 3
+    coordinator, links = start_coordinator(shard_count)
+
+    workers = []
+    crawled = {}
+    for shard_id, link in links.items():
+        config = FakeConfig(str(tmp_path / f"shard-{shard_id}.shelve"))
+        frontier = ShardedFrontier(config, True, link)
+        crawled[shard_id] = []
+        workers.append(Thread(target=crawl_shard, args=(frontier, link, crawled[shard_id])))
+    for worker in workers:
+        worker.start()
+
+    run, stats = run_in_thread(coordinator.run)
+    run.join(60)
+    assert not run.is_alive()
+    for worker in workers:
+        worker.join(10)
+
+    counts = Counter(url for shard_urls in crawled.values() for url in shard_urls)
+    assert set(counts) == reachable(FakeConfig("").seed_urls)
+    assert set(counts.values()) == {1}
+    for shard_id, shard_urls in crawled.items():
+        assert all(shard_for_url(url, shard_count) == shard_id for url in shard_urls)
+    assert sorted(len(s["crawled"]) for s in stats[0]) == sorted(map(len, crawled.values()))
+
+
+def test_lost_shard_stops_the_crawl():
+    coordinator, links = start_coordinator(2)
+    links[0].start(lambda urls: None)
+
+    # Shard 1 goes away with a batch it never read, so the coordinator's
+    # read sees a reset rather than a clean close.
+    links[0].route(1, ["https://www.dept1.uci.edu/p1"])
+    links[0].flush()
+    time.sleep(0.2)
+    links[1].close()
+
+    run, stats = run_in_thread(coordinator.run)
+    deadline = time.time() + 10
+    while not links[0].stopped and time.time() < deadline:
+        time.sleep(0.05)
+    assert links[0].stopped
+    links[0].send_stats({"crawled": []})
+
+    run.join(10)
+    assert not run.is_alive()
+    assert stats == [[{"crawled": []}]]
+
+
+def test_link_stops_when_handling_a_batch_fails():
+    coordinator, links = start_coordinator(2)
+    def broken(urls):
+        raise ValueError("bad batch")
+    links[0].start(broken)
+    links[1].start(lambda urls: None)
+
+    links[1].route(0, ["https://www.dept0.uci.edu/p1"])
+    links[1].flush()
+    deadline = time.time() + 10
+    while not links[0].stopped and time.time() < deadline:
+        time.sleep(0.05)
+    assert links[0].stopped
@@ -0,0 +1,96 @@
+import os
+import random
+from collections import deque
+from queue import Empty
+
+import pytest
+
+from utils.spill_queue import SpillQueue
+
+
+def drain(q):
+    urls = []
+    while not q.empty():
+        urls.append(q.get_nowait())
+    return urls
+
+
+def test_spills_and_refills_in_order(tmp_path):
+    q = SpillQueue(str(tmp_path), 10)
+    urls = [f"https://www.ics.uci.edu/{i}" for i in range(57)]
+    for url in urls:
+        q.put(url)
+
+    # Head holds one segment, the rest went to disk or the tail.
+    assert len(q.head) == 5
+    assert q.segments
+    assert q.qsize() == len(urls)
+
+    assert drain(q) == urls
+    assert q.qsize() == 0
+    with pytest.raises(Empty):
+        q.get_nowait()
+    assert not os.listdir(q.queue_dir)
+
+
+def test_prefetch_starts_before_head_runs_dry(tmp_path):
+    q = SpillQueue(str(tmp_path), 20)
+    for i in range(40):
+        q.put(str(i))
+
+    while len(q.head) > q.low_water + 1:
+        q.get_nowait()
+    assert q.prefetch_thread is None
+    q.get_nowait()
+    assert q.prefetch_thread is not None
+
+    # A put while a segment is in flight must not jump ahead of it.
+    q.put("late")
+    assert drain(q)[-1] == "late"
+
+
+def test_matches_fifo_under_random_operations(tmp_path):
+    rnd = random.Random(121)
+    for trial in range(50):
+        q = SpillQueue(str(tmp_path), rnd.randint(1, 40))
+        expected = deque()
+        for step in range(1000):
+            if rnd.random() < 0.55:
+                url = f"{trial}-{step}"
+                q.put(url)
+                expected.append(url)
+            elif expected:
+                assert q.get_nowait() == expected.popleft()
+            else:
+                assert q.empty()
+                with pytest.raises(Empty):
+                    q.get_nowait()
+            assert q.qsize() == len(expected)
+            assert q.empty() == (not expected)
+        assert drain(q) == list(expected)
+        q.close()
+
+
+def test_close_removes_segments(tmp_path):
+    q = SpillQueue(str(tmp_path), 4)
+    for i in range(30):
+        q.put(str(i))
+    q.get_nowait()
+    queue_dir = q.queue_dir
+    assert os.listdir(queue_dir)
+
+    q.close()
+    assert not os.path.exists(queue_dir)
+    assert q.qsize() == len(q.head) + len(q.tail)
+
+
+def test_unreadable_segment_is_logged_not_fatal(tmp_path, caplog):
+    q = SpillQueue(str(tmp_path / "spill"), 4)
+    urls = [str(i) for i in range(10)]
+    for url in urls:
+        q.put(url)
+    # head 0-1, segments 2-3 and 4-5 and 6-7, tail 8-9
+    os.remove(q.segments[0][0])
+
+    assert drain(q) == urls[:2] + urls[4:]
+    assert "Failed to read spilled segment" in caplog.text
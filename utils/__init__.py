@@ -1,24 +1,136 @@
 import os
+import time
+import atexit
 import logging
+import traceback
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue, Empty
+from threading import Lock
 from hashlib import sha256
 from urllib.parse import urlparse
 
-def get_logger(name, filename=None):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+_log_queue = SimpleQueue()
+_log_listener = None
+_log_setup_lock = Lock()
+_formatter = logging.Formatter(
+   "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+
+class _BatchedFileHandler(logging.Handler):
+    ''' Writes each record to Logs/<record.log_file>.log, flushing in batches.
+
+    Only the listener thread calls this, so one buffered file per log name is
+    shared by every logger that writes to it.
+    '''
+    def __init__(self, flush_interval=1.0):
+        super().__init__(logging.DEBUG)
+        self.flush_interval = flush_interval
+        self.files = {}
+        self.last_flush = time.monotonic()
+
+    def emit(self, record):
+        # Like the stdlib handlers, never let a bad record or I/O error
+        # escape, or it would end the listener thread and all logging.
+        try:
+            f = self.files.get(record.log_file)
+            if f is None:
+                f = open(f"Logs/{record.log_file}.log", "a", buffering=64 * 1024)
+                self.files[record.log_file] = f
+            f.write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        for f in self.files.values():
+            try:
+                f.flush()
+            except Exception:
+                self._report_error()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            try:
+                f.close()
+            except Exception:
+                self._report_error()
+        self.files.clear()
+        super().close()
+
+    @staticmethod
+    def _report_error():
+        # handleError needs a record; a failed flush has none to blame.
+        if logging.raiseExceptions:
+            traceback.print_exc()
+
+
+class _FlushingQueueListener(QueueListener):
+    ''' QueueListener that flushes the log files once the queue goes quiet.
+
+    emit only flushes when records keep arriving, so without this the last
+    lines before a pause (often the error that explains it) would sit in the
+    buffer until exit.
+    '''
+    def __init__(self, queue, file_handler, *handlers, **kwargs):
+        super().__init__(queue, file_handler, *handlers, **kwargs)
+        self.file_handler = file_handler
+
+    def dequeue(self, block):
+        if not block:
+            return self.queue.get(False)
+        while True:
+            try:
+                return self.queue.get(True, self.file_handler.flush_interval)
+            except Empty:
+                self.file_handler.flush()
+
+
+def _start_log_listener():
+    global _log_listener
     if not os.path.exists("Logs"):
         os.makedirs("Logs")
-    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
-    fh.setLevel(logging.DEBUG)
+    fh = _BatchedFileHandler()
+    fh.setFormatter(_formatter)
     ch = logging.StreamHandler()
     ch.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    ch.setFormatter(_formatter)
+    _log_listener = _FlushingQueueListener(
+        _log_queue, fh, ch, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    ''' Drain queued records and close the log files. '''
+    global _log_listener
+    with _log_setup_lock:
+        if _log_listener is not None:
+            _log_listener.stop()
+            for handler in _log_listener.handlers:
+                handler.close()
+            _log_listener = None
+
+
+def get_logger(name, filename=None):
+    logger = logging.getLogger(name)
+    with _log_setup_lock:
+        if _log_listener is None:
+            _start_log_listener()
+        if any(isinstance(h, QueueHandler) for h in logger.handlers):
+            return logger
+        logger.setLevel(logging.INFO)
+        # Loggers only enqueue; the listener thread does the file and
+        # console I/O so workers never block on it.
+        qh = QueueHandler(_log_queue)
+        log_file = filename if filename else name
+        def tag_file(record):
+            record.log_file = log_file
+            return True
+        qh.addFilter(tag_file)
+        logger.addHandler(qh)
     return logger
 
 
@@ -29,6 +141,10 @@ def get_urlhash(url):
         f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
         f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
 
+def get_domain(url):
+    ''' Domain key the frontier queues, rate limits and shards urls by. '''
+    return ".".join(urlparse(url).netloc.split(".")[-3:])
+
 def normalize(url):
     if url.endswith("/"):
         return url.rstrip("/")
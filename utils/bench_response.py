@@ -0,0 +1,81 @@
+''' Per-fetch allocation of Response, eager vs lazy decoding.
+
+Run from the project root with
+
+    python -m utils.bench_response
+
+Every fetch builds a Response from a cache server dict holding a pickled
+200 KB page. tracemalloc reports the peak allocation over the whole run.
+EagerResponse is the old Response, which unpickled the page in __init__.
+'''
+import pickle
+import time
+import tracemalloc
+
+from utils.response import Response
+
+FETCHES = 200
+PAGE_SIZE = 200_000
+
+
+class EagerResponse(object):
+    def __init__(self, resp_dict):
+        self.url = resp_dict["url"]
+        self.status = resp_dict["status"]
+        self.error = resp_dict["error"] if "error" in resp_dict else None
+        try:
+            self.raw_response = (
+                pickle.loads(resp_dict["response"])
+                if "response" in resp_dict else
+                None)
+        except TypeError:
+            self.raw_response = None
+
+
+class RawPage(object):
+    def __init__(self, url, content):
+        self.url = url
+        self.content = content
+
+
+def fetch(response_cls, payload, status, read_body):
+    resp = response_cls({"url": "https://www.ics.uci.edu", "status": status, "response": payload})
+    # Same check extract_next_links does before it touches the page.
+    if read_body and resp.status == 200:
+        resp.raw_response.content
+
+
+def measure(response_cls, payload, status, read_body):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for _ in range(FETCHES):
+        fetch(response_cls, payload, status, read_body)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    # Time separately, tracemalloc slows allocation down.
+    start = time.perf_counter()
+    for _ in range(FETCHES):
+        fetch(response_cls, payload, status, read_body)
+    per_fetch = (time.perf_counter() - start) / FETCHES
+    return peak, per_fetch
+
+
+def main():
+    payload = pickle.dumps(RawPage("https://www.ics.uci.edu", b"x" * PAGE_SIZE))
+    cases = [
+        ("status 404", 404, True),
+        ("status 200, body unread", 200, False),
+        ("status 200, body read", 200, True),
+    ]
+    print(f"{FETCHES} fetches of a {PAGE_SIZE // 1000} KB page, tracemalloc peak")
+    for name, status, read_body in cases:
+        row = [f"{name:24}"]
+        for label, response_cls in (("eager", EagerResponse), ("lazy", Response)):
+            peak, per_fetch = measure(response_cls, payload, status, read_body)
+            row.append(f"{label} {peak / 1024:7.1f} KiB {per_fetch * 1e6:5.1f} us")
+        print("   ".join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,19 @@ class Config(object):
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.spill_dir = f"{self.save_file}.spill"
+        self.queue_memory = int(config["LOCAL PROPERTIES"].get("QUEUEMEMORY", 20000))
+        self.download_log_every = max(1, int(config["LOCAL PROPERTIES"].get("DOWNLOADLOGEVERY", 1)))
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.min_revisit = float(config["CRAWLER"].get("MINREVISIT", 3600))
+        self.max_revisit = float(config["CRAWLER"].get("MAXREVISIT", 30 * 24 * 3600))
+        self.meta_sync_every = max(1, int(config["CRAWLER"].get("METASYNCEVERY", 50)))
+        self.max_body_size = int(config["CRAWLER"].get("MAXBODYSIZE", 10 * 1024 * 1024))
 
-        self.cache_server = None
\ No newline at end of file
+        self.cache_server = None
+        self.recrawl = False
\ No newline at end of file
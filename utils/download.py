@@ -8,14 +8,41 @@ def download(url, config, logger=None):
     host, port = config.cache_server
     resp = requests.get(
         f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+        params=[("q", f"{url}"), ("u", f"{config.user_agent}")],
+        stream=True)
     try:
-        if resp and resp.content:
-            return Response(cbor.loads(resp.content))
+        body = _read_body(resp, config.max_body_size)
+        if body is None:
+            logger.error(
+                f"Response for {url} exceeds {config.max_body_size} bytes, "
+                f"skipping it.")
+            return Response({
+                "error": f"Response body larger than {config.max_body_size} bytes.",
+                "status": resp.status_code,
+                "url": url})
+        if resp and body:
+            return Response(cbor.loads(body))
     except (EOFError, ValueError) as e:
         pass
+    finally:
+        resp.close()
     logger.error(f"Spacetime Response error {resp} with url {url}.")
     return Response({
         "error": f"Spacetime Response error {resp} with url {url}.",
         "status": resp.status_code,
         "url": url})
+
+
+def _read_body(resp, max_size):
+    ''' Read the streamed body, or return None once it passes max_size. '''
+    length = resp.headers.get("Content-Length")
+    if length and length.isdigit() and int(length) > max_size:
+        return None
+    chunks = []
+    size = 0
+    for chunk in resp.iter_content(chunk_size=64 * 1024):
+        size += len(chunk)
+        if size > max_size:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
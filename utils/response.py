@@ -1,14 +1,31 @@
 import pickle
 
+_NOT_LOADED = object()
+
 class Response(object):
+    __slots__ = ("url", "status", "error", "_payload", "_raw_response")
+
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        # Keep the pickled page as a view over the cbor-decoded bytes and
+        # only unpickle it the first time raw_response is read.
+        payload = resp_dict.get("response")
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            self._payload = memoryview(payload)
+            self._raw_response = _NOT_LOADED
+        else:
+            self._payload = None
+            self._raw_response = None
+
+    @property
+    def raw_response(self):
+        if self._raw_response is _NOT_LOADED:
+            try:
+                self._raw_response = pickle.loads(self._payload)
+            except (TypeError, EOFError, pickle.UnpicklingError):
+                self._raw_response = None
+            # The decoded object owns its own copy of the page now.
+            self._payload = None
+        return self._raw_response
@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+
+from collections import deque
+from queue import Empty
+from threading import Thread
+
+from utils import get_logger
+
+
+class SpillQueue(object):
+    ''' FIFO of urls that keeps at most about max_in_memory of them in RAM.
+
+    The queue is split into an in-memory head (next urls to hand out), a run
+    of on-disk segment files in the middle, and an in-memory tail (newest
+    urls). Once the tail fills a segment it is written out sequentially, and
+    the next segment is read back in a background thread while the head
+    still has urls left.
+
+    Not thread safe on its own; the frontier guards it with its lock.
+    '''
+    def __init__(self, spill_dir, max_in_memory):
+        self.spill_dir = spill_dir
+        self.segment_size = max(1, max_in_memory // 2)
+        self.low_water = max(1, self.segment_size // 4)
+
+        self.head = deque()
+        self.tail = []
+        self.segments = deque()
+        self.segment_count = 0
+        self.on_disk = 0
+
+        self.queue_dir = None
+        self.prefetch_thread = None
+        self.prefetched = None
+        self.prefetch_count = 0
+        self.prefetch_error = None
+
+    def put(self, url):
+        spilled = self.segments or self.tail or self.prefetch_thread
+        if not spilled and len(self.head) < self.segment_size:
+            self.head.append(url)
+            return
+        self.tail.append(url)
+        if len(self.tail) >= self.segment_size:
+            self._spill_tail()
+
+    def get_nowait(self):
+        if not self.head:
+            self._refill_head()
+            if not self.head:
+                raise Empty
+        url = self.head.popleft()
+        if len(self.head) <= self.low_water:
+            self._start_prefetch()
+        return url
+
+    def empty(self):
+        return not (self.head or self.tail or self.segments or self.prefetch_thread)
+
+    def qsize(self):
+        return len(self.head) + len(self.tail) + self.on_disk + self.prefetch_count
+
+    def close(self):
+        ''' Drop any spilled segments. The queue should not be used after. '''
+        if self.prefetch_thread:
+            self.prefetch_thread.join()
+            self.prefetch_thread = None
+            self.prefetched = None
+            self.prefetch_count = 0
+        if self.queue_dir:
+            shutil.rmtree(self.queue_dir, ignore_errors=True)
+            self.queue_dir = None
+        self.segments.clear()
+        self.on_disk = 0
+
+    def _spill_tail(self):
+        if not self.queue_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self.queue_dir = tempfile.mkdtemp(dir=self.spill_dir)
+        path = os.path.join(self.queue_dir, f"{self.segment_count}.seg")
+        self.segment_count += 1
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.tail))
+        self.segments.append((path, len(self.tail)))
+        self.on_disk += len(self.tail)
+        self.tail = []
+
+    def _start_prefetch(self):
+        if self.prefetch_thread or not self.segments:
+            return
+        path, count = self.segments.popleft()
+        self.on_disk -= count
+        self.prefetch_count = count
+        self.prefetched = []
+        self.prefetch_thread = Thread(
+            target=self._read_segment, args=(path, self.prefetched), daemon=True)
+        self.prefetch_thread.start()
+
+    def _read_segment(self, path, out):
+        # Runs on the prefetch thread; errors are reported by _refill_head.
+        try:
+            with open(path, encoding="utf-8") as f:
+                out.extend(f.read().split("\n"))
+            os.remove(path)
+        except Exception as e:
+            self.prefetch_error = e
+
+    def _refill_head(self):
+        # Loop so a segment that failed to load doesn't hide the ones after it.
+        while not self.head:
+            if not self.prefetch_thread:
+                self._start_prefetch()
+            if self.prefetch_thread:
+                self.prefetch_thread.join()
+                self.prefetch_thread = None
+                if self.prefetch_error:
+                    lost = self.prefetch_count - len(self.prefetched)
+                    get_logger("FRONTIER").error(
+                        f"Failed to read spilled segment: {self.prefetch_error}. "
+                        f"{lost} urls dropped from the queue, they stay pending "
+                        f"in the save file and are queued again on resume.")
+                    self.prefetch_error = None
+                self.head.extend(self.prefetched)
+                self.prefetched = None
+                self.prefetch_count = 0
+            elif self.tail:
+                # Nothing on disk, so the tail is next in line.
+                self.head.extend(self.tail)
+                self.tail = []
+            else:
+                return